@@ -15,6 +15,8 @@ import logging
 from typing import List, Optional
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
 import torch
 import torch.nn as nn
 from torch.optim import AdamW
@@ -59,33 +61,43 @@ class ModelTrainer:
         self.model = AutoModelForSequenceClassification.from_pretrained(src)
         self.model.to(self.device)
 
-        self.optimizer = AdamW(self.model.parameters(), lr=self.lr)
+        # fused (CUDA) / foreach (CPU) updates launch one kernel per tensor list
+        # instead of one per parameter; torch rejects setting both at once
+        use_fused = self.device.startswith("cuda")
+        self.optimizer = AdamW(self.model.parameters(), lr=self.lr, fused=use_fused, foreach=not use_fused)
         self.loss_fn = nn.CrossEntropyLoss()
+        # reused device-side label buffer, grown on demand
+        self._labels_buf: Optional[torch.Tensor] = None
+
+        # mixed precision on GPU: bf16 where supported, else fp16 with loss scaling
+        self._use_amp = self.device.startswith("cuda")
+        self._amp_dtype = torch.bfloat16 if self._use_amp and torch.cuda.is_bf16_supported() else torch.float16
+        self._scaler = torch.cuda.amp.GradScaler(enabled=self._use_amp and self._amp_dtype == torch.float16)
 
     def _parse_lines(self, lines: List[(str, str)]):
         """Parse iterable CSV lines and return (texts, labels).
 
         Each line should contain a text and an integer label separated by a
-        trailing comma. Lines that cannot be parsed are skipped.
+        trailing comma. Lines that cannot be parsed are skipped. Already split
+        (text, label) pairs are accepted as well; pairs whose text is not a
+        string are skipped. Parsing is done with
+        vectorized pandas string ops rather than a per-line Python loop.
         """
-        texts = []
-        labels = []
-        for l in lines:
-            l = l.strip()
-            if not l:
-                continue
-            if "," in l:
-                text, label = l.rsplit(",", 1)
-                text = text.strip().strip('"')
-                try:
-                    label = int(label.strip())
-                except Exception:
-                    continue
-                texts.append(text)
-                labels.append(label)
-            else:
-                continue
-        return texts, labels
+        if not lines:
+            return [], []
+        if isinstance(lines[0], str):
+            s = pd.Series(lines, dtype="object").str.strip()
+            parts = s[s != ""].str.rsplit(",", n=1, expand=True)
+            if parts.shape[1] < 2:
+                return [], []
+            df = pd.DataFrame({"text": parts[0].str.strip().str.strip('"'), "label": parts[1].str.strip()})
+        else:
+            df = pd.DataFrame(list(lines), columns=["text", "label"])
+            df = df[df["text"].map(lambda t: isinstance(t, str))]
+        # accept exactly what int() accepted per line: optionally signed digits
+        label = df["label"].astype(str).str.strip()
+        ok = label.str.fullmatch(r"[+-]?\d+").fillna(False).astype(bool) & df["text"].notna()
+        return df.loc[ok, "text"].astype(str).tolist(), label[ok].astype(int).tolist()
 
     def train_batch(self, lines: List[str]):
         """Perform a training step on the provided CSV lines.
@@ -99,16 +111,23 @@ class ModelTrainer:
         enc = self.tokenizer(texts, truncation=True, padding=True, max_length=self.max_length, return_tensors="pt")
         input_ids = enc["input_ids"].to(self.device)
         attention_mask = enc["attention_mask"].to(self.device)
-        labels_t = torch.tensor(labels, dtype=torch.long, device=self.device)
+        n = len(labels)
+        if self._labels_buf is None or self._labels_buf.shape[0] < n:
+            self._labels_buf = torch.empty(n, dtype=torch.long, device=self.device)
+        labels_t = self._labels_buf[:n]
+        labels_t.copy_(torch.from_numpy(np.asarray(labels, dtype=np.int64)), non_blocking=True)
 
         self.model.train()
-        outputs = self.model(input_ids=input_ids, attention_mask=attention_mask)
-        logits = outputs.logits
-        loss = self.loss_fn(logits, labels_t)
-
-        self.optimizer.zero_grad()
-        loss.backward()
-        self.optimizer.step()
+        # drop stale gradient buffers before the forward instead of zero-filling them
+        self.optimizer.zero_grad(set_to_none=True)
+        with torch.autocast(device_type=self.device.split(":")[0], dtype=self._amp_dtype, enabled=self._use_amp):
+            outputs = self.model(input_ids=input_ids, attention_mask=attention_mask)
+            logits = outputs.logits
+            loss = self.loss_fn(logits, labels_t)
+
+        self._scaler.scale(loss).backward()
+        self._scaler.step(self.optimizer)
+        self._scaler.update()
 
         logger.debug(f"ModelTrainer trained batch size={len(labels)} loss={loss.item():.4f}")
         return float(loss.item())
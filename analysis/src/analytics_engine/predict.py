@@ -4,13 +4,43 @@ This module provides a very small command-line helper to load a
 `Predictor` from a `model_dir` and print predictions for either a
 single `--text` or a file with one text per line via `--file`.
 
+Loaded predictors are cached per `model_dir` (see `get_predictor`) so
+repeated calls, including the server's `/predictor/start`, reuse the
+same tokenizer and weights instead of reloading them.
+
 Example:
     python -m analysis.src.analytics_engine.predict --model_dir ./outputs --text "I love this"
 """
 
 import argparse
+import threading
+from functools import lru_cache
+
 from .predictor import Predictor
 
+# serializes cache lookups so concurrent callers never load the same model twice
+_predictor_lock = threading.Lock()
+
+
+@lru_cache(maxsize=4)
+def _load_predictor(model_dir: str, jit: bool) -> Predictor:
+    return Predictor(model_dir, jit=jit)
+
+
+def get_predictor(model_dir: str, jit: bool = False) -> Predictor:
+    """Return the cached Predictor for `model_dir`, loading it on first use.
+
+    `jit` is passed through to `Predictor` (opt-in TorchScript tracing).
+    """
+    with _predictor_lock:
+        return _load_predictor(model_dir, jit)
+
+
+def clear_predictor_cache():
+    """Drop all cached Predictors so their models can be garbage collected."""
+    with _predictor_lock:
+        _load_predictor.cache_clear()
+
 
 def parse_args():
     p = argparse.ArgumentParser()
@@ -20,9 +50,8 @@ def parse_args():
     return p.parse_args()
 
 
-def predict_texts(model_dir, texts):
-    p = Predictor(model_dir)
-    return p.predict(texts)
+def predict_texts(model_dir, texts, jit: bool = False):
+    return get_predictor(model_dir, jit=jit).predict(texts)
 
 
 def main():
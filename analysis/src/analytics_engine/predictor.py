@@ -6,18 +6,48 @@ inference. It is designed to be lightweight and to keep model loading
 concise for use from a long-running server process.
 
 Public API:
-- Predictor(model_dir, device=None): load a tokenizer+model from
+- Predictor(model_dir, device=None, quantized=True, jit=False,
+  max_length=None, cuda_graphs=True): load a tokenizer+model from
   `model_dir` and call `predict(texts)` to obtain label predictions and
   probabilities.
+- quantize_model(model_dir, calib_file): one-shot post-training INT8
+  calibration that writes a quantized checkpoint to `{model_dir}/int8`.
 """
 
-from typing import List, Optional
+import csv
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 import torch
 import logging
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
 logger = logging.getLogger(__name__)
 
+# sub-directory of model_dir holding the INT8 checkpoint
+INT8_SUBDIR = "int8"
+# sequence lengths traced to TorchScript at load time (capped at max_length,
+# which is always traced); inputs are padded up to the nearest one. Kept
+# small because each optimized module holds its own copy of the weights.
+JIT_SEQ_LENGTHS = (32, 128, 512)
+# CUDA graphs are captured at load time for every (batch, seq) pair of
+# these batch sizes and multiples of GRAPH_SEQ_MULTIPLE up to max_length;
+# buckets are padded into the nearest captured shape, larger ones run eagerly
+GRAPH_BATCH_SIZES = (1, 2, 4, 8, 16, 32)
+GRAPH_SEQ_MULTIPLE = 64
+
+
+class _LogitsModule(torch.nn.Module):
+    """Traceable wrapper returning only the logits tensor of a HF model."""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
 
 class Predictor:
     """Wrapper around tokenizer+model for inference.
@@ -27,27 +57,369 @@ class Predictor:
         results = p.predict(['text1','text2'])
     """
 
-    def __init__(self, model_dir: str, device: Optional[str] = None):
+    def __init__(self, model_dir: str, device: Optional[str] = None, quantized: bool = True, jit: bool = False, max_length: Optional[int] = None, cuda_graphs: bool = True):
+        """Load tokenizer and model from `model_dir`.
+
+        When `quantized` is set, running on CPU and an INT8 checkpoint
+        produced by `quantize_model` exists under `{model_dir}/int8`, that
+        checkpoint is loaded in place of the FP32 weights. On GPU the weights
+        are loaded directly in the autocast dtype.
+
+        `jit` is opt-in: the model is traced to TorchScript, frozen and
+        optimized for inference at the fixed lengths in `JIT_SEQ_LENGTHS`,
+        and inputs are padded up to the nearest traced length, so nothing is
+        traced on the request path. That padding (up to ~4x more tokens than
+        the per-bucket padding of the eager path) and one weight copy per
+        traced module mean it only pays off where it has been benchmarked
+        against eager. Tracing failures fall back to eager execution.
+
+        When `cuda_graphs` is set and a DistilBERT classifier with SDPA
+        attention runs on CUDA, CUDA graphs are captured at load time for a
+        fixed grid of (batch, sequence) shapes and replayed instead of
+        re-dispatching every kernel; this takes precedence over `jit`.
+        """
         self.model_dir = model_dir
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
-        self.model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+        self.model = None
+        int8_dir = Path(model_dir) / INT8_SUBDIR
+        if quantized and self.device == "cpu" and int8_dir.is_dir():
+            try:
+                from neural_compressor.utils.load_huggingface import OptimizedModel
+
+                self.model = OptimizedModel.from_pretrained(str(int8_dir))
+                logger.info(f"Loaded INT8 model from {int8_dir}")
+            except Exception:
+                logger.exception(f"Failed to load INT8 model from {int8_dir}; falling back to FP32")
+        self._amp_dtype = self._select_amp_dtype(self.device)
+        if self.model is None:
+            # low_cpu_mem_usage avoids a random-init copy of the weights; safetensors
+            # (the save_pretrained default) and .bin checkpoints are both mmap-loaded
+            load_kwargs = dict(low_cpu_mem_usage=True, dtype=self._amp_dtype or torch.float32)
+            try:
+                # fused scaled_dot_product_attention (flash/mem-efficient kernels on GPU)
+                self.model = AutoModelForSequenceClassification.from_pretrained(model_dir, attn_implementation="sdpa", **load_kwargs)
+            except (ValueError, ImportError):
+                logger.warning(f"SDPA attention not supported for {model_dir}; using default attention")
+                self.model = AutoModelForSequenceClassification.from_pretrained(model_dir, **load_kwargs)
         self.model.to(self.device)
         self.model.eval()
+        self._init_runtime(jit, max_length, cuda_graphs)
+
+    @classmethod
+    def from_model(cls, model: torch.nn.Module, tokenizer, device: Optional[str] = None, jit: bool = False, max_length: Optional[int] = None, model_dir: Optional[str] = None, cuda_graphs: bool = True) -> "Predictor":
+        """Wrap an already loaded model/tokenizer without reloading from disk.
+
+        Used to serve a model straight from an in-process `ModelTrainer`, so
+        only one copy of the weights is resident. `jit` defaults to False
+        here because freezing/optimizing a traced module may copy weights.
+        """
+        self = cls.__new__(cls)
+        self.model_dir = model_dir
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.tokenizer = tokenizer
+        self.model = model
+        self._amp_dtype = self._select_amp_dtype(self.device)
+        self.model.to(self.device)
+        self.model.eval()
+        self._init_runtime(jit, max_length, cuda_graphs)
+        return self
+
+    @staticmethod
+    def _select_amp_dtype(device: str) -> Optional[torch.dtype]:
+        """Mixed-precision dtype for GPU forwards so matmuls run on tensor cores."""
+        if device.startswith("cuda"):
+            return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        return None
+
+    def _init_runtime(self, jit: bool, max_length: Optional[int], cuda_graphs: bool):
+        """Set up inference state shared by both constructors."""
+        max_positions = getattr(self.model.config, "max_position_embeddings", None) or self.tokenizer.model_max_length
+        self.max_length = max_length or min(self.tokenizer.model_max_length, max_positions)
+
+        # side stream + reusable pinned host buffers so H2D copies are async
+        self._copy_stream = torch.cuda.Stream() if self.device.startswith("cuda") else None
+        self._pinned: Dict[str, torch.Tensor] = {}
+        # the staging buffers (and CUDA graph static tensors) are shared per
+        # instance, so concurrent predict() calls are serialized
+        self._lock = threading.Lock()
+
+        # (batch, seq) -> (graph, static input_ids, static 4D mask, static logits)
+        self._cuda_graphs = cuda_graphs and self.device.startswith("cuda") and self._graphable()
+        self._graphs: Dict[Tuple[int, int], Tuple[torch.cuda.CUDAGraph, torch.Tensor, torch.Tensor, torch.Tensor]] = {}
+        # one memory pool shared by all graphs: inputs live outside it and
+        # outputs are cloned right after replay, so graphs never overlap in use
+        self._graph_pool = torch.cuda.graph_pool_handle() if self._cuda_graphs else None
+
+        self._jit = jit and not self._cuda_graphs
+        self._scripted_cache: Dict[int, torch.jit.ScriptModule] = {}
+        if self._jit:
+            for seq_len in sorted({min(n, self.max_length) for n in JIT_SEQ_LENGTHS} | {self.max_length}):
+                if not self._trace(seq_len):
+                    break
+
+        if self._cuda_graphs:
+            self._capture_graphs()
+
+    def _to_device(self, batch) -> List[torch.Tensor]:
+        """Move `input_ids`/`attention_mask` of `batch` to the model device.
+
+        On CUDA the tensors are staged through persistent pinned buffers and
+        copied with non_blocking=True on a dedicated stream; the current
+        stream waits on that copy before the forward runs.
+        """
+        keys = ("input_ids", "attention_mask")
+        if self._copy_stream is None:
+            return [batch[k].to(self.device) for k in keys]
+        out = []
+        with torch.cuda.stream(self._copy_stream):
+            for k in keys:
+                src = batch[k]
+                n = src.numel()
+                buf = self._pinned.get(k)
+                if buf is None or buf.numel() < n:
+                    buf = torch.empty(n, dtype=torch.long).pin_memory()
+                    self._pinned[k] = buf
+                # flat buffer prefix keeps the staged view contiguous
+                staged = buf[:n].view(src.shape)
+                staged.copy_(src)
+                out.append(staged.to(self.device, non_blocking=True))
+        current = torch.cuda.current_stream()
+        current.wait_stream(self._copy_stream)
+        for t in out:
+            t.record_stream(current)
+        return out
+
+    def _autocast(self, cache_enabled: bool = True):
+        return torch.autocast(device_type="cuda", dtype=self._amp_dtype or torch.float16, enabled=self._amp_dtype is not None, cache_enabled=cache_enabled)
+
+    def _graphable(self) -> bool:
+        """Whether `_masked_logits` can stand in for the model's forward."""
+        m = self.model
+        return (
+            hasattr(torch.cuda, "CUDAGraph")
+            and isinstance(getattr(m, "distilbert", None), torch.nn.Module)
+            and hasattr(m, "pre_classifier")
+            and getattr(m.config, "_attn_implementation", None) == "sdpa"
+        )
 
-    def predict(self, texts: List[str]):
+    def _masked_logits(self, input_ids: torch.Tensor, mask: torch.Tensor) -> torch.Tensor:
+        """DistilBERT classification forward on a precomputed attention mask.
+
+        Mirrors `DistilBertForSequenceClassification.forward` but takes a
+        boolean `(bs, 1, 1, seq)` SDPA mask directly. The model's own mask
+        preparation runs `torch.all(mask == 1)`, a host sync that cannot be
+        captured and that would bake the "no padding" branch into a graph.
+        """
+        m = self.model
+        x = m.distilbert.embeddings(input_ids)
+        hidden = m.distilbert.transformer(x=x, attn_mask=mask, head_mask=[None] * m.config.num_hidden_layers, return_dict=False)[0]
+        pooled = torch.relu(m.pre_classifier(hidden[:, 0]))
+        return m.classifier(m.dropout(pooled))
+
+    @staticmethod
+    def _padded_mask(batch_size: int, seq_len: int, device) -> torch.Tensor:
+        """2D mask with a different amount of right padding in each row."""
+        lengths = (torch.arange(1, batch_size + 1, device=device) * seq_len // batch_size).clamp(min=1)
+        return (torch.arange(seq_len, device=device)[None, :] < lengths[:, None]).long()
+
+    def _capture_graphs(self):
+        """Capture and verify every graph shape up front, off the request path.
+
+        Any capture error or graph/eager mismatch disables graphs for this
+        predictor and inference falls back to eager execution.
+        """
+        self._graph_seq_lens = sorted(set(range(GRAPH_SEQ_MULTIPLE, self.max_length + 1, GRAPH_SEQ_MULTIPLE)) | {self.max_length})
+        try:
+            # static tensors are created in inference mode so predict() may copy into them
+            with torch.inference_mode():
+                for bs in GRAPH_BATCH_SIZES:
+                    for seq_len in self._graph_seq_lens:
+                        self._graphs[(bs, seq_len)] = self._capture(bs, seq_len)
+        except Exception:
+            logger.exception("CUDA graph capture failed; using eager model")
+            self._cuda_graphs = False
+            self._graphs.clear()
+            return
+        logger.info(f"Captured {len(self._graphs)} CUDA graphs")
+
+    def _capture(self, batch_size: int, seq_len: int):
+        ids = torch.randint(0, self.model.config.vocab_size, (batch_size, seq_len), device=self.device)
+        mask_2d = self._padded_mask(batch_size, seq_len, self.device)
+        static_ids = ids.clone()
+        # capture with a padded mask so the graph records the masked attention path
+        static_mask = mask_2d[:, None, None, :].bool()
+        # warm up on a side stream so lazy init/allocations stay out of the graph
+        s = torch.cuda.Stream()
+        s.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(s), self._autocast(cache_enabled=False):
+            for _ in range(3):
+                self._masked_logits(static_ids, static_mask)
+        torch.cuda.current_stream().wait_stream(s)
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph, pool=self._graph_pool), self._autocast(cache_enabled=False):
+            static_logits = self._masked_logits(static_ids, static_mask)
+
+        graph.replay()
+        with self._autocast():
+            expected = self.model(input_ids=ids, attention_mask=mask_2d).logits
+        tol = 5e-2 if self._amp_dtype is not None else 1e-4
+        if not torch.allclose(static_logits.float(), expected.float(), rtol=tol, atol=tol):
+            raise RuntimeError(f"CUDA graph logits differ from eager for shape ({batch_size}, {seq_len})")
+        return graph, static_ids, static_mask, static_logits
+
+    @staticmethod
+    def _round_up(value: int, sizes) -> Optional[int]:
+        return min((n for n in sizes if n >= value), default=None)
+
+    def _jit_length(self, seq_len: int) -> int:
+        """Smallest traced length that fits `seq_len`."""
+        return min(n for n in self._scripted_cache if n >= seq_len)
+
+    def _trace(self, seq_len: int) -> bool:
+        """Trace, freeze and optimize the model for (1, `seq_len`) inputs.
+
+        Returns False (and disables jit for this predictor) if tracing fails.
+        """
+        try:
+            with torch.no_grad(), self._autocast():
+                input_ids = torch.zeros((1, seq_len), dtype=torch.long, device=self.device)
+                attention_mask = torch.ones_like(input_ids)
+                scripted = torch.jit.trace(_LogitsModule(self.model).eval(), (input_ids, attention_mask), strict=False)
+                scripted = torch.jit.optimize_for_inference(torch.jit.freeze(scripted))
+                # warm up so the profiling executor specializes before real traffic
+                with torch.jit.optimized_execution(True):
+                    for _ in range(2):
+                        scripted(input_ids, attention_mask)
+        except Exception:
+            logger.exception("TorchScript tracing failed; using eager model")
+            self._jit = False
+            self._scripted_cache.clear()
+            return False
+        self._scripted_cache[seq_len] = scripted
+        return True
+
+    def _forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        """Run the model and return float32 logits (autocast on GPU)."""
+        bs, seq_len = input_ids.shape
+        if self._graphs:
+            key = (self._round_up(bs, GRAPH_BATCH_SIZES), self._round_up(seq_len, self._graph_seq_lens))
+            entry = self._graphs.get(key)
+            if entry is not None:
+                graph, static_ids, static_mask, static_logits = entry
+                static_ids[:bs, :seq_len].copy_(input_ids)
+                static_mask[:bs, 0, 0, :seq_len].copy_(attention_mask)
+                # positions past this bucket's length are masked out; any id works there
+                static_mask[:bs, :, :, seq_len:] = False
+                # filler rows: any valid input works, their logits are dropped
+                static_mask[bs:] = True
+                graph.replay()
+                # copy out of the static buffer before the next replay overwrites it
+                return static_logits[:bs].float().clone()
+        scripted = self._scripted_cache.get(seq_len) if self._jit else None
+        with self._autocast():
+            if scripted is not None:
+                with torch.jit.optimized_execution(True):
+                    logits = scripted(input_ids, attention_mask)
+            else:
+                logits = self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+        # softmax in float32 for numerical stability
+        return logits.float()
+
+    def predict(self, texts: List[str], bucket_size: int = 32, structured: bool = False):
+        """Predict labels for `texts`.
+
+        Inputs are sorted by token length and run in buckets of at most
+        `bucket_size` examples, each padded only to its own longest entry,
+        so short texts do not pay for the longest one. Results are returned
+        in the original input order.
+
+        By default a list of `{"text", "pred", "probs"}` dicts is returned.
+        With `structured=True` a single `{"texts", "preds", "probs"}` dict of
+        numpy arrays is returned instead (probs as float32), which skips the
+        per-row Python conversion and serializes directly with orjson's
+        `OPT_SERIALIZE_NUMPY`.
+        """
         if not texts:
+            if structured:
+                return {"texts": [], "preds": np.empty(0, dtype=np.int64), "probs": np.empty((0, self.model.config.num_labels), dtype=np.float32)}
             return []
-        enc = self.tokenizer(texts, truncation=True, padding=True, return_tensors="pt")
-        input_ids = enc["input_ids"].to(self.device)
-        attention_mask = enc["attention_mask"].to(self.device)
-        with torch.no_grad():
-            logits = self.model(input_ids=input_ids, attention_mask=attention_mask).logits
-            probs = torch.softmax(logits, dim=-1).cpu().numpy()
-            preds = probs.argmax(axis=1).tolist()
+        enc = self.tokenizer(texts, truncation=True, max_length=self.max_length)
+        lengths = [len(ids) for ids in enc["input_ids"]]
+        order = np.argsort(lengths, kind="stable")
+
+        probs = np.empty((len(texts), self.model.config.num_labels), dtype=np.float32)
+        with self._lock, torch.inference_mode():
+            for start in range(0, len(order), bucket_size):
+                idx = order[start : start + bucket_size]
+                if self._jit:
+                    # idx is length-sorted, so its last entry is the longest
+                    pad_kwargs = {"padding": "max_length", "max_length": self._jit_length(lengths[idx[-1]])}
+                else:
+                    pad_kwargs = {}
+                batch = self.tokenizer.pad(
+                    {
+                        "input_ids": [enc["input_ids"][i] for i in idx],
+                        "attention_mask": [enc["attention_mask"][i] for i in idx],
+                    },
+                    return_tensors="np",
+                    **pad_kwargs,
+                )
+                # zero-copy view of the padded int64 arrays
+                batch = {k: torch.from_numpy(v) for k, v in batch.items()}
+                input_ids, attention_mask = self._to_device(batch)
+                logits = self._forward(input_ids, attention_mask)
+                # scatter back into original positions
+                probs[idx] = torch.softmax(logits, dim=-1).cpu().numpy()
+        if structured:
+            return {"texts": texts, "preds": probs.argmax(axis=1), "probs": probs}
+        preds = probs.argmax(axis=1).tolist()
 
         results = []
         for t, p, pred in zip(texts, probs.tolist(), preds):
             results.append({"text": t, "pred": int(pred), "probs": p})
 
         return results
+
+
+def quantize_model(model_dir: str, calib_file: str, num_samples: int = 128, batch_size: int = 8, max_length: int = 128) -> str:
+    """Run post-training static INT8 quantization for the model in `model_dir`.
+
+    Calibration uses up to `num_samples` texts from `calib_file`, a CSV with
+    a `text` column (e.g. the training CSV). The quantized model is saved to
+    `{model_dir}/int8` where `Predictor` picks it up. Requires the optional
+    `neural-compressor` package. Returns the output directory.
+    """
+    try:
+        from neural_compressor.config import PostTrainingQuantConfig
+        from neural_compressor.quantization import fit
+        from neural_compressor.utils.load_huggingface import save_for_huggingface_upstream
+    except Exception:
+        logger.exception("The 'neural-compressor' package is required for INT8 quantization. Please install with 'pip install neural-compressor'.")
+        raise
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+
+    texts = []
+    with open(calib_file, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if row.get("text"):
+                texts.append(row["text"])
+            if len(texts) >= num_samples:
+                break
+    if not texts:
+        raise ValueError(f"No calibration texts found in {calib_file}")
+
+    def collate(batch):
+        enc = tokenizer(batch, truncation=True, padding=True, max_length=max_length, return_tensors="pt")
+        return dict(enc), torch.zeros(len(batch), dtype=torch.long)
+
+    calib_dataloader = torch.utils.data.DataLoader(texts, batch_size=batch_size, collate_fn=collate)
+    q_model = fit(model=model, conf=PostTrainingQuantConfig(approach="static"), calib_dataloader=calib_dataloader)
+
+    out_dir = str(Path(model_dir) / INT8_SUBDIR)
+    save_for_huggingface_upstream(q_model, tokenizer, out_dir)
+    logger.info(f"Saved INT8 model to {out_dir}")
+    return out_dir
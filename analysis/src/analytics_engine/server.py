@@ -13,18 +13,21 @@ Public items:
     operations.
 """
 
-from fastapi import FastAPI, Request, Form
+from fastapi import FastAPI, Request, Form, Response
+import asyncio
 import logging
 from typing import Optional
 import os
 
+from .model_trainer import ModelTrainer
 from .stream_trainer import StreamTrainer
 from .predictor import Predictor
+from .predict import get_predictor, clear_predictor_cache
 from fastapi import HTTPException
 from pydantic import BaseModel
 from typing import List
 from pathlib import Path
-import json
+import orjson
 
 def load_server_config() -> dict:
     """Load repository-level config.json if present and return as dict."""
@@ -34,7 +37,7 @@ def load_server_config() -> dict:
     if not p.exists():
         return {}
     try:
-        return json.loads(p.read_text(encoding="utf-8"))
+        return orjson.loads(p.read_bytes())
     except Exception:
         return {}
 
@@ -44,6 +47,8 @@ app = FastAPI()
 class PredictRequest(BaseModel):
     text: Optional[str] = None
     texts: Optional[List[str]] = None
+    # return {"texts", "preds", "probs"} arrays instead of one dict per text
+    structured: bool = False
 
 
 class ServerManager:
@@ -62,10 +67,26 @@ class ServerManager:
         self.model_dir =  os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + "/outputs"
         # currently loaded predictor model dir
         self._predictor_model_dir: Optional[str] = None
+        # background save of the last stopped trainer's model, if any
+        self._pending_save: Optional[asyncio.Future] = None
+
+    async def _wait_pending_save(self):
+        """Wait for a background model save so a half-written checkpoint is never loaded.
+
+        A failed save is raised as a 500 instead of silently loading the
+        previous checkpoint from model_dir.
+        """
+        if self._pending_save is not None:
+            pending, self._pending_save = self._pending_save, None
+            try:
+                await pending
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Saving the last trained model failed ({e}); the checkpoint in model_dir is stale")
 
     async def start_trainer(self):
         if self._stream_trainer is not None:
             return {"status": "already_running"}
+        await self._wait_pending_save()
         if self._stream_trainer is None:
             self._stream_trainer = self.init_stream_trainer()
         await self._stream_trainer.start()
@@ -82,24 +103,49 @@ class ServerManager:
     async def stop_trainer(self):
         if self._stream_trainer is None:
             return {"status": "not_running"}
-        await self._stream_trainer.stop()
+        trainer = self._stream_trainer
+        # grab the trainer before stop() drops it so its model can be served directly
+        model_trainer = getattr(trainer, "model_trainer", None)
+        await trainer.stop(save=model_trainer is None)
         self._stream_trainer = None
+        if model_trainer is not None:
+            self.promote_trainer_to_predictor(model_trainer)
+            # persist in the background; serving does not wait on the disk write
+            self._pending_save = asyncio.get_running_loop().run_in_executor(None, self._save_trainer, model_trainer)
         return {"status": "stopped"}
 
+    def promote_trainer_to_predictor(self, model_trainer: ModelTrainer):
+        """Serve the just-trained in-memory model instead of reloading it from disk.
+
+        Replaces any loaded Predictor so only one copy of the weights stays
+        resident.
+        """
+        model = model_trainer.model
+        # gradients are not needed for serving; release them
+        model.zero_grad(set_to_none=True)
+        self.stop_predict()
+        self._predictor = Predictor.from_model(model, model_trainer.tokenizer, device=model_trainer.device, max_length=model_trainer.max_length, model_dir=model_trainer.model_dir)
+        self._predictor_model_dir = model_trainer.model_dir
+        logger.info(f"Promoted trained model to predictor (model_dir={model_trainer.model_dir})")
+
+    @staticmethod
+    def _save_trainer(model_trainer: ModelTrainer):
+        try:
+            model_trainer.save()
+        except Exception:
+            logger.exception("Failed to save trained model")
+            # keep the error on the future so _wait_pending_save surfaces it
+            raise
+
     async def ingest_stream(self, request: Request):
         if self._stream_trainer is None:
             return {"error": "trainer_not_started"}
 
-        received_data = []
-        async for chunk in request.stream():
-            if not chunk:
-                continue
-            text = chunk.decode("utf-8")
-            received_data.append(text)
-        complete_data = "".join(received_data)
-        json_data = json.loads(complete_data)
+        # Starlette buffers the body once; orjson parses the raw bytes directly
+        raw = await request.body()
+        json_data = orjson.loads(raw)
 
-        self._stream_trainer.enqueue_line(json_data)
+        await self._stream_trainer.enqueue_line(json_data)
 
         return {"status": "accepted"}
 
@@ -123,18 +169,25 @@ class ServerManager:
         else:
             raise HTTPException(status_code=400, detail="Provide 'text' or 'texts' in the request")
 
+        if req.structured:
+            results = self._predictor.predict(texts, structured=True)
+            return Response(
+                content=orjson.dumps({"results": results}, option=orjson.OPT_SERIALIZE_NUMPY),
+                media_type="application/json",
+            )
         results = self._predictor.predict(texts)
         return {"results": results}
 
-    def start_predict(self, model_dir: Optional[str] = None):
+    async def start_predict(self, model_dir: Optional[str] = None):
         """Initialize a single Predictor instance from model_dir (or manager default).
 
-        Returns a status dict.
+        Waits for any in-flight background save first. Returns a status dict.
         """
         if self._predictor is not None:
             return {"status": "already_loaded", "model_dir": self._predictor_model_dir}
+        await self._wait_pending_save()
         md = model_dir or self.model_dir
-        self._predictor = Predictor(md)
+        self._predictor = get_predictor(md)
         self._predictor_model_dir = md
         return {"status": "loaded", "model_dir": md}
 
@@ -142,18 +195,19 @@ class ServerManager:
         """Unload the currently cached Predictor. If model_dir provided, validate it matches."""
         if self._predictor is None:
             return {"status": "not_loaded"}
-        # drop reference to allow GC
+        # drop references (including the shared cache) to allow GC
         prev = self._predictor_model_dir
         self._predictor = None
         self._predictor_model_dir = None
+        clear_predictor_cache()
         return {"status": "unloaded", "model_dir": prev}
 
     def get_predictor_model_dir(self) -> Optional[str]:
         return self._predictor_model_dir
 
     # convenience aliases requested by user
-    def start_predictor(self, model_dir: Optional[str] = None):
-        return self.start_predict(model_dir=model_dir)
+    async def start_predictor(self, model_dir: Optional[str] = None):
+        return await self.start_predict(model_dir=model_dir)
 
     def stop_predictor(self, model_dir: Optional[str] = None):
         return self.stop_predict(model_dir=model_dir)
@@ -191,7 +245,7 @@ async def predict(req: PredictRequest):
 @app.post('/predictor/start')
 async def predictor_load():
     """Initialize and cache a single Predictor from model_dir."""
-    return _server_manager.start_predict()
+    return await _server_manager.start_predict()
 
 
 @app.post('/predictor/stop')
@@ -8,23 +8,38 @@ online/stream ingestion behavior.
 """
 
 import asyncio
+import collections
 import logging
-from typing import Optional, List
+import time
+from operator import itemgetter
+from typing import Deque, Dict, Optional, List, Tuple
 
 from .model_trainer import ModelTrainer
 
 logger = logging.getLogger(__name__)
 
+# width (in whitespace-separated words) of each length bucket
+LENGTH_BUCKET_WIDTH = 16
 
-class StreamTrainer:
-        """A minimal online trainer that consumes text,label CSV lines from an
-        async queue and performs incremental training steps.
+# extracts (text, label) from an example dict in a single C-level call
+_text_label = itemgetter("text", "label")
 
-        Notes:
-        - This is intentionally simple and meant for streaming demos. It does
-            not replace a full Hugging Face `Trainer` for production.
-        - Input lines should be CSV rows: text,label (label integer)
-        """
+
+class StreamTrainer:
+    """A minimal online trainer that consumes text,label CSV lines from an
+    async queue and performs incremental training steps.
+
+    Notes:
+    - This is intentionally simple and meant for streaming demos. It does
+        not replace a full Hugging Face `Trainer` for production.
+    - Input lines should be CSV rows: text,label (label integer)
+    - Train steps run in the default executor so the event loop keeps
+        accepting ingest requests while a batch is training.
+    - Examples are grouped into coarse length buckets and batches are drawn
+        from a single bucket, so each batch pads to a similar length. A
+        partial bucket is flushed once its oldest example has waited
+        `flush_interval` seconds.
+    """
 
     def __init__(self, 
         model_name: str = "distilbert-base-uncased", 
@@ -32,7 +47,8 @@ class StreamTrainer:
         device: Optional[str] = None, 
         lr: float = 5e-5, 
         batch_size: int = 8, 
-        max_length: int = 128):
+        max_length: int = 128,
+        flush_interval: float = 5.0):
 
         self.model_name = model_name
         # use a private backing field for model_dir so we can expose a read-only property
@@ -41,7 +57,10 @@ class StreamTrainer:
         self.lr = lr
         self.batch_size = batch_size
         self.max_length = max_length
+        self.flush_interval = flush_interval
         self.queue: asyncio.Queue = asyncio.Queue()
+        # bucket key -> deque of (arrival time, (text, label))
+        self._length_buckets: Dict[int, Deque[Tuple[float, Tuple[str, int]]]] = collections.defaultdict(collections.deque)
         self._task: Optional[asyncio.Task] = None
         self._running = False
 
@@ -59,31 +78,83 @@ class StreamTrainer:
         self._task = asyncio.create_task(self._consumer_loop())
         logger.info("StreamTrainer started")
 
-    async def stop(self):
+    async def stop(self, save: bool = True):
+        """Stop consuming, train on what is buffered and (optionally) save.
+
+        Pass `save=False` when the caller takes over `model_trainer` and
+        saves it itself.
+        """
         if not self._running:
             return
-        # attempt to save the model via ModelTrainer before shutting down
+        self._running = False
         try:
-            self.model_trainer.save()
-        finally:
-            self._running = False
-            # wait for queue to drain a little and cancel task
+            # let the consumer train on what is buffered, then save the model
             if self._task:
                 await self._task
                 self._task = None
+            if save:
+                self.model_trainer.save()
+        finally:
             self.model_trainer = None
             logger.info("StreamTrainer stopped")
 
     async def enqueue_line(self, json: dict):
         """Enqueue a single JSON payload containing examples: {"examples": [{"text":...,"label":...}, ...]}"""
-        data: List[(str, int)] = []
-        for l in json.get("examples", []):
-            data.append((l["text"], l["label"]))
+        data: List[Tuple[str, int]] = list(map(_text_label, json.get("examples", ())))
 
         await self.queue.put(data)
 
+    def _route(self, examples: List[Tuple[str, int]]):
+        """Append examples to their length bucket.
+
+        Word count is a cheap proxy for token length; texts longer than
+        `max_length` words are truncated anyway and share the last bucket.
+        Non-string texts are bucketed by their `str()` form; they are
+        dropped later by `ModelTrainer._parse_lines`.
+        """
+        now = time.monotonic()
+        last = self.max_length // LENGTH_BUCKET_WIDTH
+        for ex in examples:
+            key = min(len(str(ex[0]).split()) // LENGTH_BUCKET_WIDTH, last)
+            self._length_buckets[key].append((now, ex))
+
+    def _take(self, key: int, n: int) -> List[Tuple[str, int]]:
+        bucket = self._length_buckets[key]
+        return [bucket.popleft()[1] for _ in range(min(n, len(bucket)))]
+
+    def _ready_batches(self, flush_all: bool = False) -> List[List[Tuple[str, int]]]:
+        """Pop the batches that are ready to train.
+
+        Every full bucket yields batches of `batch_size`. Then, if the
+        oldest buffered example is stale, its bucket is flushed as a
+        partial batch. With `flush_all` every bucket is emptied.
+        """
+        batches = []
+        for key, bucket in self._length_buckets.items():
+            while len(bucket) >= self.batch_size:
+                batches.append(self._take(key, self.batch_size))
+        if flush_all:
+            for key, bucket in self._length_buckets.items():
+                while bucket:
+                    batches.append(self._take(key, self.batch_size))
+            return batches
+        pending = [(bucket[0][0], key) for key, bucket in self._length_buckets.items() if bucket]
+        if pending:
+            oldest, key = min(pending)
+            if time.monotonic() - oldest >= self.flush_interval:
+                batches.append(self._take(key, self.batch_size))
+        return batches
+
+    def _drain_queue(self):
+        """Route every payload already on the queue without yielding."""
+        while True:
+            try:
+                self._route(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
     async def _consumer_loop(self):
-        buffer: List[(str, int)] = []
+        loop = asyncio.get_running_loop()
         while self._running:
             try:
                 line = await asyncio.wait_for(self.queue.get(), timeout=1.0)
@@ -91,25 +162,30 @@ class StreamTrainer:
                 line = None
 
             if line:
-                buffer.extend(line)
+                # a bad payload must not kill the consumer task
+                try:
+                    self._route(line)
+                    self._drain_queue()
+                except Exception:
+                    logger.exception("Error while buffering stream examples")
 
-            # If we have enough for a batch, run a train step
-            if len(buffer) >= self.batch_size:
-                batch_lines = buffer[: self.batch_size]
-                buffer = buffer[self.batch_size :]
+            for batch_lines in self._ready_batches():
                 try:
-                    self._train_step(batch_lines)
+                    await loop.run_in_executor(None, self._train_step, batch_lines)
                 except Exception:
                     logger.exception("Error during train step")
 
         # drain remaining buffer once stopped
-        if buffer:
+        try:
+            self._drain_queue()
+        except Exception:
+            logger.exception("Error while buffering stream examples")
+        for batch_lines in self._ready_batches(flush_all=True):
             try:
-                self._train_step(buffer)
+                await loop.run_in_executor(None, self._train_step, batch_lines)
             except Exception:
                 logger.exception("Error during final train step")
 
-
     def _train_step(self, lines: List[(str, int)]):
         if not lines:
             return
@@ -12,8 +12,11 @@ library; for programmatic training prefer directly constructing a
 """
 
 import argparse
+import json
 import logging
-from datasets import load_dataset
+import os
+import torch
+from datasets import load_dataset, load_from_disk
 from transformers import (
     AutoTokenizer,
     AutoModelForSequenceClassification,
@@ -40,9 +43,18 @@ def parse_args():
     p.add_argument("--delimiter", default=",", help="CSV delimiter when using local_only or diagnostics")
     p.add_argument("--encoding", default="utf-8", help="File encoding for local CSVs")
     p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--overwrite_cache", action="store_true", help="Re-tokenize even if a tokenized dataset is cached in output_dir")
     return p.parse_args()
 
 
+def _file_key(path):
+    """Identify a data file by path, size and mtime so in-place edits invalidate the cache."""
+    if not path:
+        return None
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+
+
 def main():
     args = parse_args()
 
@@ -118,10 +130,37 @@ def main():
     tokenizer = AutoTokenizer.from_pretrained(args.model, use_fast=True)
 
     def preprocess(batch):
-        return tokenizer(batch[text_col], truncation=True, padding="max_length", max_length=args.max_length)
-
-    ds = ds.map(preprocess, batched=True)
-    ds = ds.rename_column(label_col, "labels")
+        # no padding here: DataCollatorWithPadding pads each batch to its own max
+        return tokenizer(batch[text_col], truncation=True, max_length=args.max_length)
+
+    # Reuse the tokenized splits from a previous run when they were produced
+    # from the same inputs; the arguments are stored next to the cache
+    tokenized_dir = os.path.join(args.output_dir, "tokenized")
+    cache_key_path = os.path.join(tokenized_dir, "cache_key.json")
+    cache_key = {
+        "model": args.model,
+        "max_length": args.max_length,
+        "train_file": _file_key(args.train_file),
+        "validation_file": _file_key(args.validation_file),
+        "local_only": args.local_only,
+        "delimiter": args.delimiter,
+        "encoding": args.encoding,
+    }
+    cached_key = None
+    if os.path.isfile(cache_key_path) and not args.overwrite_cache:
+        with open(cache_key_path, "r", encoding="utf-8") as f:
+            cached_key = json.load(f)
+    if cached_key == cache_key:
+        logger.info(f"Loading tokenized dataset from {tokenized_dir}")
+        ds = load_from_disk(tokenized_dir)
+    else:
+        if cached_key is not None:
+            logger.info(f"Tokenized dataset in {tokenized_dir} was built with different arguments; re-tokenizing")
+        ds = ds.map(preprocess, batched=True, num_proc=os.cpu_count())
+        ds = ds.rename_column(label_col, "labels")
+        ds.save_to_disk(tokenized_dir)
+        with open(cache_key_path, "w", encoding="utf-8") as f:
+            json.dump(cache_key, f)
     ds.set_format(type="torch", columns=["input_ids", "attention_mask", "labels"]) 
 
     # Convert labels column to a Python list in a safe way. Some Dataset
@@ -152,6 +191,7 @@ def main():
         f1 = metric_f1.compute(predictions=preds, references=labels, average="weighted")
         return {"accuracy": acc["accuracy"], "f1": f1["f1"]}
 
+    use_bf16 = torch.cuda.is_available() and torch.cuda.is_bf16_supported()
     training_args = TrainingArguments(
         output_dir=args.output_dir,
         eval_strategy="epoch",
@@ -163,10 +203,14 @@ def main():
         load_best_model_at_end=True,
         metric_for_best_model="f1",
         seed=args.seed,
-        fp16=False,
+        # bucket examples of similar length to minimize per-batch padding
+        group_by_length=True,
+        # mixed precision on GPU: prefer bf16, fall back to fp16
+        bf16=use_bf16,
+        fp16=torch.cuda.is_available() and not use_bf16,
     )
 
-    data_collator = DataCollatorWithPadding(tokenizer)
+    data_collator = DataCollatorWithPadding(tokenizer, pad_to_multiple_of=8)
 
     trainer = Trainer(
         model=model,